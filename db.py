@@ -1,8 +1,7 @@
 import sqlite3
 import logging
-from typing import Iterable
-import pandas as pd
-from contextlib import contextmanager
+import hashlib
+from typing import Iterable, Iterator
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -16,19 +15,108 @@ class PartialHashCollisionException(Exception):
         self.dir_id = dir_id
         self.has_hash_complete = has_hash_complete
 
+class Md5Aggregate():
+    '''SQLite aggregate computing hashlib.md5("\\n".join(values).encode("ascii")).hexdigest() over its input rows.'''
+
+    def __init__(self) -> None:
+        self.md5 = hashlib.md5()
+        self.first = True
+
+    def step(self, value) -> None:
+        if not self.first:
+            self.md5.update(b"\n")
+        self.first = False
+        self.md5.update((value or '').encode("ascii"))
+
+    def finalize(self) -> str:
+        return self.md5.hexdigest()
+
+class Transaction():
+    '''Transaction context manager for Database. A plain __enter__/__exit__ class is used instead of @contextmanager since one of these is entered per insert. Nested use is mapped to savepoints, so a batch-level transaction can wrap methods that already open their own transaction.'''
+
+    def __init__(self, db: "Database") -> None:
+        self.db = db
+        self.savepoint = None
+
+    def __enter__(self) -> None:
+        if self.db.conn.in_transaction:
+            self.savepoint = f"sp_{self.db.savepoint_count}"
+            self.db.savepoint_count += 1
+            self.db._sqlSavepoint(self.savepoint)
+        else:
+            self.db._sqlStartTransaction()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self.savepoint:
+            self.db.savepoint_count -= 1
+            if exc_type:
+                logger.error(f"Transaction failed: {exc_value}", exc_info=True)
+                self.db._sqlRollbackSavepoint(self.savepoint)
+                # Rolled-back rows may be cached; refill from the database on demand
+                self.db.dir_cache.clear()
+            else:
+                self.db._sqlReleaseSavepoint(self.savepoint)
+
+        elif exc_type:
+            logger.error(f"Transaction failed: {exc_value}", exc_info=True)
+            self.db._sqlRollbackTransaction()
+            self.db.dir_cache.clear()
+
+        else:
+            self.db._sqlCommitTransaction()
+
 class Database():
 
     def __init__(self, db_path) -> None:
         logger.info(f"Initializing database connection, db_path={db_path}")
-        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        # cached_statements covers all hot statements; since every query is a literal string constant, repeated calls hit sqlite3's compiled-statement cache and skip the re-parse.
+        self.conn = sqlite3.connect(db_path, isolation_level=None, cached_statements=256)
         self.curs = self.conn.cursor()
+        # Dedicated cursor for streaming reads, so an open iteration is not clobbered by statements on the main cursor
+        self.iter_curs = self.conn.cursor()
+        self.savepoint_count = 0
+        # id -> [parent_id, hash], kept in sync by insertDir/_sqlUpdateDir so the per-dir lookups in the hash roll-up pass are dict hits instead of SELECTs
+        self.dir_cache = {}
+        # batch size -> multi-row INSERT statement, so each size is formatted (and compiled) once
+        self.insert_files_sql_cache = {}
+        # (hash, size) pairs known to be in files, so the per-insert collision probe is a set lookup and the SELECT only runs for true collisions. A miss is authoritative (every insert adds its pair); a stale hit after a rollback just pays the confirming SELECT.
+        self.partial_seen = set()
+        try:
+            self.partial_seen.update(self._sqlExecute("SELECT DISTINCT hash, size FROM files") or [])
+        except sqlite3.OperationalError:
+            # Fresh database, no schema yet
+            pass
+        # WAL avoids rewriting the rollback journal on every commit, NORMAL sync is safe in WAL mode, and a bigger in-memory page cache plus memory temp store keeps hot index pages off disk. Disk-only pragmas are no-ops for ":memory:" databases.
+        # PRAGMA foreign_keys is set here (not in initialize()) so the connection enforces FKs no matter how the schema was created. It is a no-op within a transaction, and none is open yet.
+        self._sqlExecuteScript("""--sql
+            PRAGMA foreign_keys = on;
+            -- page_size only takes effect on a fresh database (set before the first table is created); harmless no-op otherwise
+            PRAGMA page_size = 8192;
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA cache_size = -64000;
+            PRAGMA busy_timeout = 5000;
+            PRAGMA mmap_size = 268435456;
+        """)
+        self.conn.create_aggregate("md5cat", 1, Md5Aggregate)
 
     def _sqlStartTransaction(self) -> None:
-        self.curs.execute("BEGIN;")
+        # IMMEDIATE takes the write lock up front instead of upgrading at the first write, avoiding an SQLITE_BUSY race against concurrent readers
+        self.curs.execute("BEGIN IMMEDIATE;")
 
     def _sqlCommitTransaction(self) -> None:
         self.curs.execute("COMMIT;")
 
+    def _sqlSavepoint(self, name: str) -> None:
+        self.curs.execute(f"SAVEPOINT {name};")
+
+    def _sqlReleaseSavepoint(self, name: str) -> None:
+        self.curs.execute(f"RELEASE {name};")
+
+    def _sqlRollbackSavepoint(self, name: str) -> None:
+        self.curs.execute(f"ROLLBACK TO {name};")
+
     def _sqlRollbackTransaction(self) -> None:
         try:
             logger.info(f"Trying to rowback transaction...")
@@ -42,42 +130,69 @@ class Database():
         res = self.curs.fetchall()
         return res or None
 
-    def _sqlExecuteMany(self, sql: str, *args) -> list[tuple] | None:
+    def _sqlWrite(self, sql: str, *args) -> None:
+        # Write statements produce no rows; skip the empty fetchall() _sqlExecute would allocate
+        self.curs.execute(sql, *args)
+
+    def _sqlExecuteMany(self, sql: str, *args) -> None:
+        # executemany() only accepts statements that return no rows, so there is nothing to fetch
         self.curs.executemany(sql, *args)
-        res = self.curs.fetchall()
-        return res or None
 
     def _sqlExecuteScript(self, script: str) -> None:
         self.curs.executescript(script)
 
     def _sqlGetFirst(self, sql: str, *args) -> tuple | None:
-        res = self._sqlExecute(sql, *args)
-        return res[0] if res else None
+        # fetchone() skips the result-list allocation fetchall() would make for these single-row lookups
+        self.curs.execute(sql, *args)
+        return self.curs.fetchone()
 
-    def _sqlInsertDir(self, path: str, parent_id: int, dup_id: int) -> None:
-        self._sqlExecute("""--sql
-                INSERT INTO dirs (path, parent_id, duplicate_id) VALUES (?, ?, ?)
+    def _sqlInsertDir(self, path: str, parent_id: int, dup_id: int) -> int:
+        res = self._sqlGetFirst("""--sql
+                INSERT INTO dirs (path, parent_id, duplicate_id) VALUES (?, ?, ?) RETURNING id
             """, (path, parent_id, dup_id))
+        id, *_ = res
+        return id
 
     def _sqlInsertFile(self, path: str, size: int, dir_id: int, hash: str, hash_complete: str | None = None, dup_id: int | None = None) -> None:
-        self._sqlExecute("""--sql
+        self._sqlWrite("""--sql
                 INSERT INTO files (path, size, dir_id, hash, hash_complete, duplicate_id) VALUES (?, ?, ?, ?, ?, ?)
             """, (path, size, dir_id, hash, hash_complete, dup_id))
 
-    def _sqlUpdateDir(self, id, hash, dup_id=None) -> None:
-        self._sqlExecute("""--sql
-                UPDATE dirs
-                SET hash = ?, duplicate_id = ?
-                WHERE id = ?
-            """, (hash, dup_id, id))
-
-    def _sqlDirRemoveDupID(self, ids: Iterable[int]) -> None:
-        ids = [(id, ) for id in ids]
-        self._sqlExecuteMany("""--sql
+    def _sqlInsertFilesMany(self, rows: Iterable[tuple]) -> None:
+        # Multi-row VALUES instead of executemany: one statement step per chunk rather than one per row. 150 rows of 6 columns stays under SQLite's 999 bound-parameter limit.
+        rows = list(rows)
+        for i in range(0, len(rows), 150):
+            chunk = rows[i:i + 150]
+            sql = self.insert_files_sql_cache.get(len(chunk))
+            if sql is None:
+                values = ", ".join(["(?, ?, ?, ?, ?, ?)"] * len(chunk))
+                sql = f"INSERT INTO files (path, size, dir_id, hash, hash_complete, duplicate_id) VALUES {values}"
+                self.insert_files_sql_cache[len(chunk)] = sql
+            self._sqlWrite(sql, [item for row in chunk for item in row])
+
+    def _sqlGetPartialHashCollisions(self, keys: Iterable[tuple]) -> set[tuple]:
+        keys = list(keys)
+        collided = set()
+        # Row-value IN list, chunked to stay under SQLite's 999 bound-parameter limit
+        for i in range(0, len(keys), 450):
+            chunk = keys[i:i + 450]
+            values = ", ".join(["(?, ?)"] * len(chunk))
+            params = [item for key in chunk for item in key]
+            res = self._sqlExecute(f"""--sql
+                    SELECT DISTINCT hash, size FROM files WHERE (hash, size) IN (VALUES {values})
+                """, params)
+            collided.update(res or [])
+        return collided
+
+    def _sqlUpdateDir(self, id, hash) -> None:
+        # duplicate_id is reset so the row leaves its old group (trg_dirs_dup_cleanup) and can be stamped into the new one (trg_dirs_dup)
+        self._sqlWrite("""--sql
                 UPDATE dirs
-                SET duplicate_id = NULL
+                SET hash = ?, duplicate_id = NULL
                 WHERE id = ?
-            """, ids)
+            """, (hash, id))
+        if id in self.dir_cache:
+            self.dir_cache[id][1] = hash
 
     def _lastRowID(self) -> int | None:
         return self.curs.lastrowid
@@ -89,45 +204,20 @@ class Database():
             DROP TABLE IF EXISTS duplicates;
         """)
 
-    def _sqlInsertDuplicate(self, type) -> int | None:
-        self._sqlExecute("""--sql
-                INSERT INTO duplicates (type) VALUES (?)
-            """, (type, ))
-        return self._lastRowID()
-
-    def _sqlRemoveDuplicate(self, id) -> None:
-        self._sqlExecute("""--sql
-                DELETE FROM duplicates WHERE id = ?;
-            """, (id, ))
+    def transaction(self) -> "Transaction":
+        return Transaction(self)
 
-    def _sqlGetDirsFromDupID(self, dup_id: Iterable[int]) -> list[int]:
-        res = self._sqlExecute("""--sql
-                SELECT id FROM dirs WHERE duplicate_id = ?
-            """, (dup_id, ))
-        return [id for (id, *_) in res]
-
-    @contextmanager
-    def transaction(self) -> None:
-        self._sqlStartTransaction()
-        try:
-            yield
-        except sqlite3.Error as e:
-            logger.error(f"Transaction failed: {e}", exc_info=True)
-            self._sqlRollbackTransaction()
-            raise
-        else:
-            self._sqlCommitTransaction()
+    def initializeSchema(self, root_path: str = "/") -> None:
+        '''Create the tables, the root dir row and the indexes the scan itself depends on (the hash/dir_id lookups). The reporting indexes are deferred to finalizeIndexes() so a bulk load right after does not pay their maintenance per row.'''
 
-    def initialize(self, root_path: str = "/") -> None:
         # cursor.executescript implicitly commit any pending transactions, cannot apply context manager startTransaction() here.
         self._dropAll()
+        self.dir_cache.clear()
+        self.partial_seen.clear()
         self._sqlExecuteScript("""--sql
-            
-            -- PRAGMA foreign_keys is a no-op within a transaction; foreign key constraint enforcement may only be enabled or disabled when there is no pending BEGIN or SAVEPOINT.
-            PRAGMA foreign_keys = on;
 
             BEGIN;
-            
+
             CREATE TABLE duplicates (
                 id INTEGER PRIMARY KEY,
                 type TEXT NOT NULL
@@ -156,16 +246,78 @@ class Database():
             );
 
             CREATE INDEX idx_files_dir_id ON files (dir_id);
-            CREATE INDEX idx_files_hash ON files (hash);
-            CREATE INDEX idx_files_duplicate_id ON files (duplicate_id);
-            CREATE INDEX idx_files_hash_complete ON files (hash_complete);
+            -- Composite indexes matching the collision lookups (hash = ? AND size = ?), so each is one B-tree seek instead of an index scan plus filter. The hash_complete index is partial: it skips the mass of NULL rows a first scan produces.
+            CREATE INDEX idx_files_hash_size ON files (hash, size);
+            CREATE INDEX idx_files_hash_complete_size ON files (hash_complete, size) WHERE hash_complete IS NOT NULL;
             CREATE INDEX idx_dirs_hash ON dirs (hash);
-            CREATE INDEX idx_dirs_duplicate_id ON dirs (duplicate_id);
+
+            -- Duplicate bookkeeping for files happens in-database: when a row lands with a complete hash matching other rows, create the duplicates entry (unless the group already exists) and stamp every unstamped member. insertFile is left with the partial-collision check plus a single INSERT.
+            CREATE TRIGGER trg_files_dup AFTER INSERT ON files
+            WHEN NEW.hash_complete IS NOT NULL AND NEW.duplicate_id IS NULL
+            BEGIN
+                INSERT INTO duplicates (type)
+                SELECT 'file'
+                WHERE EXISTS (SELECT 1 FROM files WHERE hash_complete = NEW.hash_complete AND size = NEW.size AND id <> NEW.id)
+                    AND NOT EXISTS (SELECT 1 FROM files WHERE hash_complete = NEW.hash_complete AND size = NEW.size AND duplicate_id IS NOT NULL);
+                UPDATE files SET duplicate_id = COALESCE(
+                        (SELECT duplicate_id FROM files WHERE hash_complete = NEW.hash_complete AND size = NEW.size AND duplicate_id IS NOT NULL LIMIT 1),
+                        (SELECT MAX(id) FROM duplicates))
+                WHERE hash_complete = NEW.hash_complete AND size = NEW.size AND duplicate_id IS NULL
+                    AND EXISTS (SELECT 1 FROM files WHERE hash_complete = NEW.hash_complete AND size = NEW.size AND id <> NEW.id);
+            END;
+
+            -- Mirror of trg_files_dup for dirs: when a dir's hash changes to match other dirs, create the duplicates entry (unless the group already exists) and stamp every unstamped member. updateDirHash is left with a single UPDATE.
+            CREATE TRIGGER trg_dirs_dup AFTER UPDATE OF hash ON dirs
+            WHEN NEW.hash IS NOT NULL AND NEW.hash IS NOT OLD.hash
+            BEGIN
+                INSERT INTO duplicates (type)
+                SELECT 'dir'
+                WHERE EXISTS (SELECT 1 FROM dirs WHERE hash = NEW.hash AND id <> NEW.id)
+                    AND NOT EXISTS (SELECT 1 FROM dirs WHERE hash = NEW.hash AND duplicate_id IS NOT NULL);
+                UPDATE dirs SET duplicate_id = COALESCE(
+                        (SELECT duplicate_id FROM dirs WHERE hash = NEW.hash AND duplicate_id IS NOT NULL LIMIT 1),
+                        (SELECT MAX(id) FROM duplicates))
+                WHERE hash = NEW.hash AND duplicate_id IS NULL
+                    AND EXISTS (SELECT 1 FROM dirs WHERE hash = NEW.hash AND id <> NEW.id);
+            END;
+
+            -- Garbage-collect a dir's old duplicate group when it leaves: once fewer than two members remain, detach them and drop the duplicates row. Keeps updateDirHash to one UPDATE instead of SELECT + executemany + DELETE round trips.
+            CREATE TRIGGER trg_dirs_dup_cleanup AFTER UPDATE OF duplicate_id ON dirs
+            WHEN OLD.duplicate_id IS NOT NULL AND NEW.duplicate_id IS NOT OLD.duplicate_id
+            BEGIN
+                UPDATE dirs SET duplicate_id = NULL
+                WHERE duplicate_id = OLD.duplicate_id
+                    AND (SELECT COUNT(*) FROM dirs WHERE duplicate_id = OLD.duplicate_id) < 2;
+                DELETE FROM duplicates
+                WHERE id = OLD.duplicate_id
+                    AND NOT EXISTS (SELECT 1 FROM dirs WHERE duplicate_id = OLD.duplicate_id);
+            END;
 
             COMMIT;
         """)
 
         self.rootDirID = self.insertDir(root_path, None)
+
+    def finalizeIndexes(self) -> None:
+        '''Create the indexes only queried after scanning (duplicate listing, size grouping). Called once the bulk load is done.'''
+
+        self._sqlExecuteScript("""--sql
+
+            BEGIN;
+
+            CREATE INDEX IF NOT EXISTS idx_files_size ON files (size);
+            CREATE INDEX IF NOT EXISTS idx_files_duplicate_id ON files (duplicate_id) WHERE duplicate_id IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS idx_dirs_duplicate_id ON dirs (duplicate_id) WHERE duplicate_id IS NOT NULL;
+
+            COMMIT;
+
+            -- Refresh planner statistics so the (hash, size) probes keep picking the composite indexes
+            ANALYZE;
+        """)
+
+    def initialize(self, root_path: str = "/") -> None:
+        self.initializeSchema(root_path)
+        self.finalizeIndexes()
         
     def commit(self) -> None:
         self._sqlCommitTransaction()
@@ -174,26 +326,32 @@ class Database():
         '''Not SQL injection safe!'''
 
         print("\n----- " + f'Dumping table "{table}"' " -----\n" )
-        print(pd.read_sql_query(f"SELECT * FROM {table}", self.conn))
+        self.curs.execute(f"SELECT * FROM {table}")
+        print("\t".join(col for (col, *_) in self.curs.description))
+        for row in self.curs:
+            print("\t".join(str(field) for field in row))
         print("\n----- " + f'End of table "{table}"' " -----\n" )
 
-    def insertDir(self, path: str, parent_id: int, dup_id: int | None = None) -> int | None:
-        self._sqlInsertDir(path, parent_id, dup_id)
-        return self._lastRowID()
+    def insertDir(self, path: str, parent_id: int, dup_id: int | None = None) -> int:
+        id = self._sqlInsertDir(path, parent_id, dup_id)
+        self.dir_cache[id] = [parent_id, None]
+        return id
 
     def insertFile(self, path: str, size: int, dir_id: int, hash: str, hash_complete: str | None = None) -> None:
         # If file size < 1024, hash_complete will be set to the same value as hash
         if size < 1024:
             hash_complete = hash
 
-        # For file bigger than 1024, first scan (partial hash)
+        # For file bigger than 1024, first scan (partial hash). The SELECT only runs when the in-memory probe says the pair may exist.
         if not hash_complete:
-            res = self._sqlGetFirst("""--sql
-                SELECT id, path, dir_id, hash_complete
-                FROM files
-                WHERE hash = ? AND size = ?
-                LIMIT 1
-            """, (hash, size))
+            res = None
+            if (hash, size) in self.partial_seen:
+                res = self._sqlGetFirst("""--sql
+                    SELECT id, path, dir_id, hash_complete
+                    FROM files
+                    WHERE hash = ? AND size = ?
+                    LIMIT 1
+                """, (hash, size))
 
             # If there is a match, throw exception to request a full hash
             if res:
@@ -207,116 +365,145 @@ class Database():
 
             # Insert file if no match is found
             else:
+                self.partial_seen.add((hash, size))
                 self._sqlInsertFile(path, size, dir_id, hash)
                 return
 
-        # For file smaller than 1024, first scan (partial hash) or file bigger than 1024, second scan (full hash)
-        res = self._sqlGetFirst("""--sql
-                SELECT id, duplicate_id
-                FROM files
-                WHERE hash_complete = ? AND size = ?
-                LIMIT 1
-            """, (hash_complete, size))
+        # For file smaller than 1024, first scan (partial hash) or file bigger than 1024, second scan (full hash): single insert, trg_files_dup creates/joins the duplicate group in-database
+        self.partial_seen.add((hash, size))
+        self._sqlInsertFile(path, size, dir_id, hash, hash_complete)
+
+    def insertFiles(self, files: Iterable[tuple]) -> None:
+        '''Batched insertFile(). Entries are (path, size, dir_id, hash[, hash_complete]) tuples, all inserted within a single transaction so commits are amortized over the batch. Partial-hash collisions are prefetched with one grouped lookup, so collision-free large files (the common case) go through executemany instead of per-row SELECT + INSERT; the remaining rows fall back to insertFile(). A PartialHashCollisionException rolls back and aborts the whole batch, so callers should provide hash_complete for files that may collide.'''
 
-        file_id, dup_id = res or (None, None)
+        files = [file if len(file) > 4 else (*file, None) for file in files]
+        # Only pairs the in-memory probe knows about can collide; the rest skip the prefetch entirely
+        collided = self._sqlGetPartialHashCollisions(
+            (hash, size) for _, size, _, hash, hash_complete in files
+            if size >= 1024 and not hash_complete and (hash, size) in self.partial_seen)
 
-        # Freshly detected duplicate, insert new row in "duplicates"
-        # TODO: Add hash_complete column to duplicates
+        pending = []
         with self.transaction():
-            if file_id and (not dup_id):
-                dup_id = self._sqlInsertDuplicate("file")
+            for path, size, dir_id, hash, hash_complete in files:
+                if size >= 1024 and not hash_complete and (hash, size) not in collided:
+                    collided.add((hash, size))
+                    self.partial_seen.add((hash, size))
+                    pending.append((path, size, dir_id, hash, None, None))
 
-                self._sqlExecute("""--sql
-                    UPDATE files
-                    SET duplicate_id = ?
-                    WHERE id = ?
-                """, (dup_id, file_id))
+                else:
+                    # Flush queued fast-path rows first so the per-row path sees them
+                    if pending:
+                        self._sqlInsertFilesMany(pending)
+                        pending = []
+                    self.insertFile(path, size, dir_id, hash, hash_complete)
 
-            self._sqlInsertFile(path, size, dir_id, hash, hash_complete, dup_id)
+            if pending:
+                self._sqlInsertFilesMany(pending)
 
     def updateDirHash(self, id: int, hash: str) -> None:
-        res = self._sqlGetFirst("""--sql
-                SELECT hash, duplicate_id
-                FROM dirs
-                WHERE id = ?
-            """, (id, ))
-
-        old_hash, old_dup_id = res
-
         # If hash has not changed, do nothing
-        if old_hash == hash:
+        if self.getDirHash(id) == hash:
             return
 
-        with self.transaction():
-            # If duplicate record exists for old hash, remove it
-            if old_dup_id:
-                res = self._sqlGetDirsFromDupID(old_dup_id)
-                # If there's only 2 dirs with same old_dup_id, remove the entry in duplicates table
-                if len(res) == 2:
-                    self._sqlDirRemoveDupID(res)
-                    self._sqlRemoveDuplicate(old_dup_id)
-                
-                else:
-                    self._sqlDirRemoveDupID((id, ))
+        # Single statement: trg_dirs_dup_cleanup dissolves the old duplicate group and trg_dirs_dup creates/joins the new one in-database
+        self._sqlUpdateDir(id, hash)
+
+    def updateFileCompleteHash(self, id: int, hash_complete: str) -> None:
+        self._sqlWrite("""--sql
+                UPDATE files SET hash_complete = ? WHERE id = ?
+            """, (hash_complete, id))
 
-            # Check if there is a duplicate folder
+    def _getDirCached(self, id: int) -> list:
+        entry = self.dir_cache.get(id)
+        if entry is None:
             res = self._sqlGetFirst("""--sql
-                    SELECT id, duplicate_id
-                    FROM dirs
-                    WHERE hash = ?
-                    LIMIT 1
-                """, (hash, ))
+                    SELECT parent_id, hash FROM dirs WHERE id = ?
+                """, (id, ))
+            entry = list(res)
+            self.dir_cache[id] = entry
+        return entry
 
-            dir_id, dup_id = res or (None, None)
+    def getDirHash(self, id: int) -> str:
+        return self._getDirCached(id)[1]
 
-            # Freshly detected duplicate folder
-            if dir_id and (not dup_id):
-                dup_id = self._sqlInsertDuplicate("dir")
+    def getDirParentID(self, id: int) -> int:
+        return self._getDirCached(id)[0]
 
-                self._sqlExecute("""--sql
-                    UPDATE dirs
-                    SET duplicate_id = ?
-                    WHERE id = ?
-                """, (dup_id, dir_id))
+    def getCandidateSizeGroups(self) -> list[tuple]:
+        '''First-pass duplicate filter done in SQL: (size, "id1,id2,...") for every size shared by more than one file. SQLite does the grouping, Python only sees the collision buckets.'''
+        res = self._sqlExecute("""--sql
+                SELECT size, GROUP_CONCAT(id)
+                FROM files
+                GROUP BY size
+                HAVING COUNT(*) > 1
+            """)
+        return res or []
 
-            self._sqlUpdateDir(id, hash, dup_id)
+    def getCandidateHashGroups(self) -> list[tuple]:
+        '''Same as getCandidateSizeGroups(), grouped on the partial hash instead.'''
+        res = self._sqlExecute("""--sql
+                SELECT hash, GROUP_CONCAT(id)
+                FROM files
+                GROUP BY hash
+                HAVING COUNT(*) > 1
+            """)
+        return res or []
+
+    def iterChildrenHashes(self, id: int) -> Iterator[str]:
+        '''Yields children hashes straight off a dedicated cursor, avoiding a fetchall of the whole directory.'''
+
+        self.iter_curs.execute("""--sql
+                SELECT h
+                FROM (
+                    SELECT id, COALESCE(hash_complete, hash, '') AS h FROM files WHERE dir_id = ?
+                    UNION ALL
+                    SELECT id, COALESCE(hash, '') AS h FROM dirs WHERE parent_id = ?
+                    ORDER BY id
+                )
+            """, (id, id))
 
-    def updateFileCompleteHash(self, id: int, hash_complete: str) -> None:
-        self._sqlExecute("""--sql
-                UPDATE files SET hash_complete = ? WHERE id = ?
-            """, (hash_complete, id))
+        for hash, *_ in self.iter_curs:
+            yield hash
 
-    def getDirHash(self, id: int) -> str:
-        res = self._sqlGetFirst("""--sql
-                SELECT hash FROM dirs WHERE id = ?
-            """, (id, ))
+    def getChildrenHashes(self, id: int) -> list[str]:
+        return list(self.iterChildrenHashes(id))
 
-        hash, *_ = res
-        return hash
+    def getChildrenHashesConcat(self, id: int) -> str:
+        '''Newline-joined children hashes, concatenated inside SQLite so only the final string crosses into Python. Equals "\\n".join(getChildrenHashes(id)).'''
 
-    def getDirParentID(self, id: int) -> int:
         res = self._sqlGetFirst("""--sql
-                SELECT parent_id FROM dirs WHERE id = ?
-            """, (id, ))
+                SELECT COALESCE(group_concat(h, char(10)), '')
+                FROM (
+                    SELECT id, COALESCE(hash_complete, hash, '') AS h FROM files WHERE dir_id = ?
+                    UNION ALL
+                    SELECT id, COALESCE(hash, '') AS h FROM dirs WHERE parent_id = ?
+                    ORDER BY id
+                )
+            """, (id, id))
 
-        id, *_ = res
-        return id
+        concat, *_ = res
+        return concat
 
-    def getChildrenHashes(self, id: int) -> list[str]:
-        res = self._sqlExecute("""--sql
-                SELECT id, hash, hash_complete FROM files WHERE dir_id = ?
-                UNION ALL
-                SELECT id, hash, NULL FROM dirs WHERE parent_id = ?
-                ORDER BY id
-            """, (id, id))
+    def getDirRollupHash(self, id: int) -> str:
+        '''Directory hash computed in-database by the md5cat aggregate over the children hashes, so only the final digest crosses into Python. Equals md5 of getChildrenHashesConcat(id).'''
 
-        hashes = []
-        for entry in res:
-            _, hash, hash_complete = entry
-            hashes.append(hash_complete or hash or '')
+        res = self._sqlGetFirst("""--sql
+                SELECT md5cat(h)
+                FROM (
+                    SELECT id, COALESCE(hash_complete, hash, '') AS h FROM files WHERE dir_id = ?
+                    UNION ALL
+                    SELECT id, COALESCE(hash, '') AS h FROM dirs WHERE parent_id = ?
+                    ORDER BY id
+                )
+            """, (id, id))
 
-        return hashes
+        hash, *_ = res
+        # md5cat returns NULL when the dir has no children; match the digest of the empty string
+        return hash or hashlib.md5(b'').hexdigest()
 
     def close(self) -> None:
+        # Let SQLite re-ANALYZE whatever changed enough to skew the planner stats
+        self.conn.execute("PRAGMA optimize;")
+        self.iter_curs.close()
         self.curs.close()
         self.conn.close()
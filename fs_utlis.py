@@ -15,14 +15,23 @@ def cd(newdir):
 def dir_dfs(path):
     '''Generator for all files and directories in a directory, directory path and comes before the children are iterated and "None" comes after everything.'''
 
-    for p in Path(path).iterdir():
-        if p.is_symlink():
+    # Iterative scandir walk: DirEntry type checks are answered from the directory read itself (no stat per entry), and an explicit stack of open iterators replaces the recursion.
+    stack = [os.scandir(path)]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop().close()
+            if stack:
+                yield ('dir', None)
+            continue
+
+        p = Path(entry.path)
+        if entry.is_symlink():
             yield ('symlink', p)
 
-        if p.is_file():
+        if entry.is_file():
             yield ('file', p)
-            
-        if p.is_dir():
+
+        if entry.is_dir():
             yield ('dir', p)
-            yield from dir_dfs(p)
-            yield ('dir', None)
+            stack.append(os.scandir(p))
@@ -1,15 +1,27 @@
 import hashlib
+import os
 from PIL import Image
 import imagehash
 
 def partial_hasher(path, size) -> str:
-    with open(path, 'rb') as f:
-        if size < 1024:
-            chunk = f.read()
-        else:
-            chunk = f.read(1024)
+    # Raw open + pread: no BufferedReader allocation for a one-shot 1 KiB read. pread stops at EOF on its own, so size only matters to callers.
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        chunk = os.pread(fd, 1024, 0)
+    finally:
+        os.close(fd)
     return hashlib.md5(chunk).hexdigest()
 
+def scan_hasher(path) -> tuple[int, str]:
+    '''Fused stat + partial hash: one open serves both the fstat for the size and the pread for the probe, instead of a stat syscall followed by a second open.'''
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        chunk = os.pread(fd, 1024, 0)
+    finally:
+        os.close(fd)
+    return size, hashlib.md5(chunk).hexdigest()
+
 def image_hasher(path) -> str:
     with Image.open(path) as img:
         # TODO: Find best hash function
@@ -17,12 +29,7 @@ def image_hasher(path) -> str:
         hash = imagehash.average_hash(img)
         return str(hash)
 
-def full_hasher(path, block_size=2**20) -> str:
-    md5 = hashlib.md5()
+def full_hasher(path) -> str:
+    # hashlib.file_digest streams in C (readinto on a reused buffer, GIL released), replacing the chunked Python read loop
     with open(path, 'rb') as f:
-        while True:
-            chunk = f.read(block_size)
-            if not chunk:
-                break
-            md5.update(chunk)
-    return md5.hexdigest()
+        return hashlib.file_digest(f, 'md5').hexdigest()
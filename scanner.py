@@ -1,4 +1,4 @@
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import NoReturn
 
@@ -19,7 +19,7 @@ img_extensions = ('.jpg', '.png', '.gif', '.tiff', '.jpeg', '.bmp')
 class Scanner():
     def __init__(self, db_path: Path | str) -> None:
         self.db = DB.Database(db_path)
-        self.db.initialize()
+        self.db.initializeSchema()
         self.dir_stack =[]
 
     @property
@@ -31,15 +31,24 @@ class Scanner():
 
         return id
 
-    def file_handler(self, path: Path) -> None:
-        size = path.stat().st_size
+    @staticmethod
+    def hash_file(path: Path) -> tuple[int, str]:
+        '''First-pass hash of a single file, independent of any database state so it can run on a worker thread.'''
+        if path.suffix.casefold() in img_extensions:
+            return path.stat().st_size, hashers.image_hasher(path)
+
+        # scan_hasher fuses the stat and the probe read into one open
+        return hashers.scan_hasher(path)
+
+    def file_handler(self, path: Path, size: int | None = None, file_hash: str | None = None) -> None:
+        if size is None:
+            size, file_hash = Scanner.hash_file(path)
 
         if path.suffix.casefold() in img_extensions:
-            image_hash = hashers.image_hasher(path)
-            self.db.insertFile(str(path), size, self.current_dir_id, image_hash, image_hash)
+            self.db.insertFile(str(path), size, self.current_dir_id, file_hash, file_hash)
 
         else:
-            partial_hash = hashers.partial_hasher(path, size)
+            partial_hash = file_hash
             try:
                 self.db.insertFile(str(path), size, self.current_dir_id, partial_hash)
             # Catch exception if identical partial hash exists
@@ -64,9 +73,7 @@ class Scanner():
             self.dir_stack.append((id, path))
 
     def dir_hasher(self, id: int) -> str:
-        hashes = self.db.getChildrenHashes(id)
-        hash_str = "\n".join(hashes)
-        return hashlib.md5(hash_str.encode("ascii")).hexdigest()
+        return self.db.getDirRollupHash(id)
 
     def dir_hash_update(self, id: int) -> None:
         if id != self.db.rootDirID:
@@ -90,8 +97,21 @@ class Scanner():
             raise UnexpectedPathType
 
     def scan(self, path: Path) -> None:
-        for type, p in fs_utlis.dir_dfs(path):
-            self.switcher(type, p)
+        # First-pass hashes depend only on file contents, so they are computed up front on a thread pool: reads and md5 both release the GIL. Inserts then replay the walk in order on this thread, since they must see earlier rows (collision checks) and the sqlite connection is single-threaded.
+        events = list(fs_utlis.dir_dfs(path))
+        with ThreadPoolExecutor() as pool:
+            hashes = iter(list(pool.map(Scanner.hash_file, (p for type, p in events if type == 'file'))))
+
+        # Single transaction over the whole walk, otherwise every insert pays its own commit. Nested transactions opened by db methods become savepoints.
+        with self.db.transaction():
+            for type, p in events:
+                if type == 'file':
+                    self.file_handler(p, *next(hashes))
+                else:
+                    self.switcher(type, p)
+
+        # Reporting indexes are built once after the bulk load instead of being maintained per insert
+        self.db.finalizeIndexes()
 
     def dumpResults(self) -> None:
         self.db.dumpTable("dirs")
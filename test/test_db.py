@@ -1,6 +1,7 @@
 import unittest
 import db as DB
 import sqlite3
+import hashlib
 import logging
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s: %(name)s [%(levelname)s] %(message)s')
@@ -68,6 +69,46 @@ class TestPrepMock(unittest.TestCase):
         self.assertEqual(exception.path, "test/path/to/file")
         self.assertFalse(exception.has_hash_complete)
 
+    def test_insert_files_batch(self):
+        dirID = self.db.insertDir("test/path/to", self.db.rootDirID)
+        self.db.insertFiles([
+            ("test/path/to/file1", 50, dirID, "hashOfTestFile1"),
+            ("test/path/to/file2", 50, dirID, "hashOfTestFile2"),
+            ("test/path/to/file3", 3000, dirID, "hashOfTestFile3", "completeHashOfTestFile3")])
+        res = self.db._sqlExecute("""SELECT * FROM files""")
+        self.assertEqual(res, [
+            (1, "test/path/to/file1", 50, dirID, "hashOfTestFile1", "hashOfTestFile1", None),
+            (2, "test/path/to/file2", 50, dirID, "hashOfTestFile2", "hashOfTestFile2", None),
+            (3, "test/path/to/file3", 3000, dirID, "hashOfTestFile3", "completeHashOfTestFile3", None)])
+
+    def test_insert_files_batch_rollback(self):
+        dirID = self.db.insertDir("test/path/to", self.db.rootDirID)
+        with self.assertRaises(sqlite3.Error):
+            self.db.insertFiles([
+                ("test/path/to/file1", 50, dirID, "hashOfTestFile1"),
+                ("test/path/to/file2", -1, dirID, "hashOfTestFile2")])
+        res = self.db._sqlExecute("""SELECT * FROM files""")
+        self.assertEqual(res, None)
+
+    def test_insert_files_batch_fast_path(self):
+        dirID = self.db.insertDir("test/path/to", self.db.rootDirID)
+        self.db.insertFiles([
+            ("test/path/to/file1", 3000, dirID, "hashOfTestFile1"),
+            ("test/path/to/file2", 4000, dirID, "hashOfTestFile2")])
+        res = self.db._sqlExecute("""SELECT * FROM files""")
+        self.assertEqual(res, [
+            (1, "test/path/to/file1", 3000, dirID, "hashOfTestFile1", None, None),
+            (2, "test/path/to/file2", 4000, dirID, "hashOfTestFile2", None, None)])
+
+    def test_insert_files_batch_partial_collision(self):
+        dirID = self.db.insertDir("test/path/to", self.db.rootDirID)
+        self.db.insertFile("test/path/to/file1", 3000, dirID, "hashOfTestFile")
+        with self.assertRaises(DB.PartialHashCollisionException):
+            self.db.insertFiles([("test/path2/to/file1", 3000, dirID, "hashOfTestFile")])
+        res = self.db._sqlExecute("""SELECT * FROM files""")
+        self.assertEqual(res, [
+            (1, "test/path/to/file1", 3000, dirID, "hashOfTestFile", None, None)])
+
     def test_update_file_complete_hash(self):
         dirID = self.db.insertDir("test/path/to", self.db.rootDirID)
         self.db.insertFile("test/path/to/file", 3000, dirID, "hashOfTestFile")
@@ -156,6 +197,22 @@ class TestPrepMock(unittest.TestCase):
         res = res[1:]
         self.assertEqual(res, [(dirID1, None), (dirID2, None)])
 
+    def test_get_candidate_size_groups(self):
+        dirID = self.db.insertDir("test/path/to", self.db.rootDirID)
+        self.db.insertFile("test/path/to/file1", 50, dirID, "hashOfTestFile1")
+        self.db.insertFile("test/path/to/file2", 50, dirID, "hashOfTestFile2")
+        self.db.insertFile("test/path/to/file3", 70, dirID, "hashOfTestFile3")
+        res = self.db.getCandidateSizeGroups()
+        self.assertEqual(res, [(50, "1,2")])
+
+    def test_get_candidate_hash_groups(self):
+        dirID = self.db.insertDir("test/path/to", self.db.rootDirID)
+        self.db.insertFile("test/path/to/file1", 50, dirID, "hashOfTestFile")
+        self.db.insertFile("test/path/to/file2", 50, dirID, "hashOfTestFile")
+        self.db.insertFile("test/path/to/file3", 70, dirID, "otherHash")
+        res = self.db.getCandidateHashGroups()
+        self.assertEqual(res, [("hashOfTestFile", "1,2")])
+
     def test_get_children_hashes(self):
         dirID_1 = self.db.insertDir("test/path/to", self.db.rootDirID)
         dirID_2 = self.db.insertDir("test/path2/to", self.db.rootDirID)
@@ -168,6 +225,17 @@ class TestPrepMock(unittest.TestCase):
         print(res)
         self.assertEqual(res, ['hashOfTestFileSmall', 'completeHashOfTestFile', 'hashOfTestDir'])
 
+    def test_get_dir_rollup_hash(self):
+        dirID = self.db.insertDir("test/path/to", self.db.rootDirID)
+        self.db.insertFile("test/path/to/file1", 50, dirID, "hashOfTestFile1")
+        self.db.insertFile("test/path/to/file2", 3000, dirID, "hashOfTestFile2", "completeHashOfTestFile2")
+        expected = hashlib.md5("\n".join(self.db.getChildrenHashes(dirID)).encode("ascii")).hexdigest()
+        self.assertEqual(self.db.getDirRollupHash(dirID), expected)
+
+    def test_get_dir_rollup_hash_empty_dir(self):
+        dirID = self.db.insertDir("test/path/to", self.db.rootDirID)
+        self.assertEqual(self.db.getDirRollupHash(dirID), hashlib.md5(b'').hexdigest())
+
     def test_get_dir_hash(self):
         dirID = self.db.insertDir("test/path/to/dir", self.db.rootDirID)
         self.db.updateDirHash(dirID, "hashOfTestDir")